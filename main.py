@@ -12,21 +12,26 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QLineEdit, QTextEdit, QSlider, QSpinBox, QComboBox,
                             QFileDialog, QListWidget, QListWidgetItem, QTabWidget,
                             QGroupBox, QCheckBox, QColorDialog, QFontDialog,
-                            QProgressBar, QMessageBox, QSplitter, QFrame,
+                            QProgressBar, QProgressDialog, QMessageBox, QSplitter, QFrame,
                             QScrollArea, QSizePolicy, QSpacerItem)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRect
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRect, QObject, QRunnable, QThreadPool
 from PyQt5.QtGui import (QPixmap, QPainter, QFont, QColor, QPen, QBrush,
                         QImage, QFontMetrics, QTransform, QIcon)
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance
+from PIL import Image, ImageDraw, ImageFont, ImageChops
 import json
-import math
+import re
+import functools
 import threading
+import io
+import queue
+import hashlib
+import mmap
+from collections import OrderedDict
 
 # 在创建 QApplication 之前，自动设置 Qt 插件路径（兼容 PyQt5\Qt 与 PyQt5\Qt5 布局）
 def _ensure_qt_plugin_env():
     try:
         import PyQt5
-        import os
         import os.path as p
         base = p.dirname(PyQt5.__file__)
         for qt_folder in ("Qt", "Qt5"):
@@ -44,62 +49,548 @@ def _ensure_qt_plugin_env():
         pass
 
 # 供预览与导出共用的字体选择逻辑
+_FONTS_DIR = os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')
+# 字体文件映射: 常规, 粗体, 斜体, 粗斜体
+_FONT_FILES = {
+    'Microsoft YaHei': ('msyh.ttc', 'msyhbd.ttc', None, None),
+    'SimSun': ('simsun.ttc', None, None, None),
+    'SimHei': ('simhei.ttf', None, None, None),
+    'Arial': ('arial.ttf', 'arialbd.ttf', 'ariali.ttf', 'arialbi.ttf'),
+    'Times New Roman': ('times.ttf', 'timesbd.ttf', 'timesi.ttf', 'timesbi.ttf'),
+}
+
+# 中日韩统一表意文字（基本区、扩展 A、扩展 B）
+_CJK_RE = re.compile('[\u3400-\u4dbf\u4e00-\u9fff\U00020000-\U0002a6df]')
+
+@functools.lru_cache(maxsize=32)
+def _has_cjk(s: str) -> bool:
+    # 预览每次刷新都会检查同一段水印文字，按文本缓存结果
+    return _CJK_RE.search(s) is not None
+
+@functools.lru_cache(maxsize=1)
+def _fonts_dir_index():
+    """字体目录中的文件名（小写）集合，只列一次目录，代替逐个 os.path.exists"""
+    try:
+        return frozenset(name.lower() for name in os.listdir(_FONTS_DIR))
+    except OSError:
+        return frozenset()
+
+@functools.lru_cache(maxsize=64)
+def _select_font_file(family: str, is_bold: bool = False, is_italic: bool = False, cjk: bool = False):
+    """返回 (字体文件路径, has_real_bold, has_real_italic)；找不到时路径为 None。
+
+    cjk 表示文本是否含中日韩字符，为真时优先中文字体。
+    """
+    def select_variant(fam: str):
+        reg, bold, italic, bolditalic = _FONT_FILES.get(fam, (None, None, None, None))
+        if is_bold and is_italic and bolditalic:
+            return bolditalic, True, True
+        if is_bold and bold:
+            return bold, True, False
+        if is_italic and italic:
+            return italic, False, True
+        return reg, False, False
+
+    search_order = []
+    if cjk:
+        search_order.extend(['Microsoft YaHei', 'SimSun', 'SimHei'])
+    if family not in search_order:
+        search_order.insert(0, family)
+
+    tried = set()
+    for fam in search_order:
+        fname, real_bold, real_italic = select_variant(fam)
+        if not fname:
+            continue
+        fpath = os.path.join(_FONTS_DIR, fname)
+        if fpath in tried:
+            continue
+        tried.add(fpath)
+        if fname.lower() in _fonts_dir_index():
+            return fpath, real_bold, real_italic
+    return None, False, False
+
 def get_font_for_text(family: str, size: int, is_bold: bool = False, is_italic: bool = False, text: str = ""):
     """返回 (font, has_real_bold, has_real_italic)。优先中文字体和匹配样式。"""
-    try:
-        fonts_dir = os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')
-        mapping = {
-            'Microsoft YaHei': ('msyh.ttc', 'msyhbd.ttc', None, None),
-            'SimSun': ('simsun.ttc', None, None, None),
-            'SimHei': ('simhei.ttf', None, None, None),
-            'Arial': ('arial.ttf', 'arialbd.ttf', 'ariali.ttf', 'arialbi.ttf'),
-            'Times New Roman': ('times.ttf', 'timesbd.ttf', 'timesi.ttf', 'timesbi.ttf'),
-        }
+    # 文本只影响是否优先中文字体，缓存键只取这一位，避免任意文本撑大缓存
+    return _load_font(family, size, bool(is_bold), bool(is_italic), _has_cjk(text))
 
-        def select_variant(fam: str):
-            reg, bold, italic, bolditalic = mapping.get(fam, (None, None, None, None))
-            if is_bold and is_italic and bolditalic:
-                return bolditalic, True, True
-            if is_bold and bold:
-                return bold, True, False
-            if is_italic and italic:
-                return italic, False, True
-            return reg, False, False
-
-        def has_cjk(s: str) -> bool:
-            for ch in s:
-                code = ord(ch)
-                if (0x4E00 <= code <= 0x9FFF) or (0x3400 <= code <= 0x4DBF) or (0x20000 <= code <= 0x2A6DF):
-                    return True
-            return False
+@functools.lru_cache(maxsize=64)
+def _load_truetype(path, size):
+    """按 (字体文件或字体名, 字号) 缓存 FreeType 字体对象"""
+    return ImageFont.truetype(path, size=size)
 
-        search_order = []
-        if has_cjk(text):
-            search_order.extend(['Microsoft YaHei', 'SimSun', 'SimHei'])
-        if family not in search_order:
-            search_order.insert(0, family)
-
-        tried = set()
-        for fam in search_order:
-            fname, real_bold, real_italic = select_variant(fam)
-            if not fname:
-                continue
-            fpath = os.path.join(fonts_dir, fname)
-            if fpath in tried:
-                continue
-            tried.add(fpath)
-            if os.path.exists(fpath):
-                return ImageFont.truetype(fpath, size=size), real_bold, real_italic
+@functools.lru_cache(maxsize=64)
+def _load_font(family, size, is_bold, is_italic, cjk):
+    """按 (字体族, 字号, 样式, 是否中文) 缓存已加载的字体，避免重复解析字体文件"""
+    try:
+        fpath, real_bold, real_italic = _select_font_file(family, is_bold, is_italic, cjk)
+        if fpath:
+            return _load_truetype(fpath, size), real_bold, real_italic
 
         try:
-            return ImageFont.truetype(family, size=size), False, False
+            return _load_truetype(family, size), False, False
         except Exception:
             return ImageFont.load_default(), False, False
     except Exception:
         return ImageFont.load_default(), False, False
 
+@functools.lru_cache(maxsize=128)
+def _alpha_lut(opacity):
+    """不透明度对应的 256 项 alpha 查找表（滑块取值有限，按值缓存）"""
+    return [round(p * opacity) for p in range(256)]
+
+def _scale_alpha(image, opacity):
+    """按不透明度（0~1）缩放 RGBA 图片的 alpha 通道，原地修改并返回该图片"""
+    # point 传入查找表时整张通道在 C 层一次完成
+    image.putalpha(image.getchannel('A').point(_alpha_lut(opacity)))
+    return image
+
+def _flatten_to_rgb(image, background=(255, 255, 255)):
+    """将 RGBA 图片铺到纯色背景上得到 RGB 图片；完全不透明时直接丢弃 alpha 通道"""
+    if image.mode != 'RGBA':
+        return image if image.mode == 'RGB' else image.convert('RGB')
+    alpha = image.getchannel('A')
+    if alpha.getextrema() == (255, 255):
+        # 常见的不透明照片无需逐像素混合背景
+        return image.convert('RGB')
+    rgb_image = Image.new('RGB', image.size, background)
+    rgb_image.paste(image, mask=alpha)
+    return rgb_image
+
+# 导出相关的逻辑放在模块级函数中，使其可被子进程 pickle 调用
+
+# 每个导出子进程内缓存的水印资源，由进程池 initializer 填充
+_export_prepared = None
+# 限制输出尺寸时按缩放比例准备的水印资源（LRU）：比例 -> 资源
+_export_prepared_scaled = OrderedDict()
+
+def _prepare_export_watermark(settings, scale=1.0):
+    """预先解码水印图片、排版并光栅化文字，这些在整批导出中保持不变
+
+    文本水印只绘制一次得到 text_tile，每张图片只需按位置混合，无需重复排版和光栅化。
+    scale 不为 1 时水印按该比例缩小（字号、阴影偏移同比），与缩小后的图片及预览保持一致；
+    wm_size 与 text_size 始终为原比例下的尺寸，用于在原图坐标下计算位置。
+    """
+    prepared = {'wm_img': None, 'wm_size': (0, 0), 'text_tile': None, 'text_offset': (0, 0),
+                'text_size': (0, 0), 'scale': scale}
+    wm_type = settings.get('watermark_type', '文本水印')
+    if wm_type == '图片水印':
+        path = settings.get('image_watermark_path')
+        if path and os.path.exists(path):
+            try:
+                with Image.open(path) as wm_img:
+                    # convert 总是返回新图片，退出上下文后依然可用
+                    wm_img = wm_img.convert('RGBA')
+                op = max(0, min(100, int(settings.get('image_watermark_opacity', 70)))) / 100.0
+                if op < 1.0:
+                    _scale_alpha(wm_img, op)
+                prepared['wm_size'] = wm_img.size
+                if scale != 1.0:
+                    scaled_size = (max(1, round(wm_img.width * scale)), max(1, round(wm_img.height * scale)))
+                    wm_img = wm_img.resize(scaled_size, Image.LANCZOS)
+                # 与预览一致：先以自身 alpha 为蒙版粘贴到透明层，再与原图合成
+                layer = Image.new('RGBA', wm_img.size, (0, 0, 0, 0))
+                layer.paste(wm_img, (0, 0), wm_img)
+                prepared['wm_img'] = layer
+            except Exception:
+                pass
+    else:
+        wm = settings['watermark_settings']
+        text = wm.get('text', '水印文字')
+        font_size = wm.get('font_size', 24)
+        font_family = wm.get('font_family', 'Microsoft YaHei')
+        is_bold = wm.get('is_bold', False)
+        is_italic = wm.get('is_italic', False)
+        # 优先使用预览解析好的字体路径，确保导出与预览一致
+        resolved = settings.get('resolved_font_path')
+
+        def load_font(size):
+            if resolved and os.path.exists(resolved):
+                try:
+                    # 粗体判定：若路径对应粗体文件名，视为真实粗体
+                    name = os.path.basename(resolved).lower()
+                    return _load_truetype(resolved, size), ('bd' in name) or ('bold' in name)
+                except Exception:
+                    pass
+            font, has_real_bold, _ = get_font_for_text(
+                font_family, size, is_bold=is_bold, is_italic=is_italic, text=text
+            )
+            return font, has_real_bold
+
+        font, has_real_bold = load_font(font_size)
+        measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        bbox = measure.textbbox((0, 0), text, font=font)
+        text_size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+        shadow_offset = 2
+        if scale != 1.0:
+            # 与预览相同：按比例缩小字号和阴影偏移后重新排版
+            font, has_real_bold = load_font(max(1, round(font_size * scale)))
+            bbox = measure.textbbox((0, 0), text, font=font)
+            shadow_offset = max(1, round(2 * scale))
+
+        # 颜色和透明度，与预览一致
+        opacity = wm.get('opacity', 70)
+        base_color = wm.get('font_color', (255,255,255,180))
+        color = (base_color[0], base_color[1], base_color[2], int(255 * opacity / 100))
+
+        # 阴影（与预览一致）及伪粗体
+        shadow_color = (0, 0, 0, color[3] // 2) if wm.get('has_shadow', False) else None
+        fake_bold = is_bold and not has_real_bold
+        tile, offset = _render_text_tile(text, font, bbox, color, fake_bold, shadow_color, shadow_offset)
+        prepared.update({
+            'text_tile': tile,
+            'text_offset': offset,
+            'text_size': text_size,
+        })
+    return prepared
+
+def _init_export_worker(settings):
+    """进程池 initializer：每个子进程只准备一次水印资源"""
+    global _export_prepared
+    _export_prepared = _prepare_export_watermark(settings)
+    _export_prepared_scaled.clear()
+
+def _scaled_export_watermark(settings, scale):
+    """返回按 scale 缩放的水印资源；同一批图片尺寸通常相同，按比例缓存少量结果"""
+    key = round(scale, 6)
+    prepared = _export_prepared_scaled.get(key)
+    if prepared is not None:
+        _export_prepared_scaled.move_to_end(key)
+        return prepared
+    prepared = _export_prepared_scaled[key] = _prepare_export_watermark(settings, scale)
+    if len(_export_prepared_scaled) > 8:
+        _export_prepared_scaled.popitem(last=False)
+    return prepared
+
+def _has_alpha(image):
+    """判断图片是否带透明信息"""
+    return 'A' in image.getbands() or 'transparency' in image.info
+
+def _blit_tile(base, tile, pos):
+    """将 RGBA 小图按 alpha 混合到 base 的 pos 处，只处理二者重叠的区域（原地修改 base）"""
+    x, y = pos
+    if base.mode != 'RGBA':
+        # 不透明底图：以小图 alpha 为蒙版粘贴，等价于 alpha 合成
+        base.paste(tile, (x, y), tile)
+        return
+    # 旧版 Pillow 的 alpha_composite 不接受负坐标，越界部分改由 source 偏移裁掉
+    left, top = max(0, -x), max(0, -y)
+    if left >= tile.width or top >= tile.height or x >= base.width or y >= base.height:
+        return
+    base.alpha_composite(tile, (x + left, y + top), (left, top))
+
+def _render_text_tile(text, font, bbox, color, fake_bold=False, shadow_color=None, shadow_offset=2):
+    """将文本（含阴影、伪粗体）绘制到刚好容纳它的透明小图上
+
+    返回 (tile, (dx, dy))，tile 应粘贴到文本绘制原点偏移 (dx, dy) 的位置。
+    """
+    # 阴影向右下偏移 shadow_offset 像素，伪粗体向右下扩展 1 像素
+    pad = max(shadow_offset, 1 if fake_bold else 0) if shadow_color is not None else (1 if fake_bold else 0)
+    dx, dy = min(0, bbox[0]), min(0, bbox[1])
+    tile = Image.new('RGBA', (max(1, bbox[2] + pad - dx), max(1, bbox[3] + pad - dy)), (0, 0, 0, 0))
+    # 字形只光栅化一次成蒙版，阴影与正文都用它上色粘贴；
+    # 右下留有 pad 空白，offset 平移时卷回左上的只是空白
+    mask = Image.new('L', tile.size, 0)
+    ImageDraw.Draw(mask).text((-dx, -dy), text, font=font, fill=255)
+    box = (0, 0, tile.width, tile.height)
+    if shadow_color is not None:
+        tile.paste(shadow_color, box, ImageChops.offset(mask, shadow_offset, shadow_offset))
+    if fake_bold:
+        # 把字形蒙版向右、向下各平移 1 像素后以 screen 叠加，
+        # 结果与在 (0,0)(1,0)(0,1)(1,1) 四处重复描字相同
+        mask = ImageChops.screen(mask, ImageChops.offset(mask, 1, 0))
+        mask = ImageChops.screen(mask, ImageChops.offset(mask, 0, 1))
+    tile.paste(color, box, mask)
+    return tile, (dx, dy)
+
+def _render_export_watermark(image, settings, prepared=None, orig_size=None):
+    """为图片添加水印（导出用，与预览逻辑保持一致）
+
+    水印只在其外接矩形内与原图混合；不透明原图直接以 RGB 处理，无需整图 RGBA 中间层。
+    image 已被缩小时，orig_size 为原图尺寸，prepared 应为同比例缩放的水印资源：
+    位置仍按原图坐标计算再按比例换算，与预览做法相同。
+    返回的图片可能就是传入的 image（已被原地修改）。
+    """
+    if prepared is None:
+        prepared = _prepare_export_watermark(settings)
+    scale = prepared['scale']
+    layout_size = orig_size or image.size
+
+    def place(overlay_size):
+        pos = _calc_pos_by_setting(settings, layout_size, overlay_size)
+        if scale != 1.0:
+            pos = (round(pos[0] * scale), round(pos[1] * scale))
+        return pos
+
+    if _has_alpha(image):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    wm_type = settings.get('watermark_type', '文本水印')
+    if wm_type == '图片水印':
+        # 与预览一致的图片水印
+        wm_img = prepared['wm_img']
+        if wm_img is not None:
+            # 放置位置沿用文本位置计算（以水印图片尺寸为准）
+            _blit_tile(image, wm_img, place(prepared['wm_size']))
+    elif prepared['text_tile'] is not None:
+        # 计算文本位置，混合预先绘制好的文字小图
+        pos = place(prepared['text_size'])
+        dx, dy = prepared['text_offset']
+        _blit_tile(image, prepared['text_tile'], (pos[0] + dx, pos[1] + dy))
+
+    return image
+
+# 九宫格预设位置：(图片宽, 图片高, 水印宽, 水印高, 边距) -> 左上角坐标
+_POSITION_TABLE = {
+    'top_left': lambda iw, ih, w, h, m: (m, m),
+    'top_center': lambda iw, ih, w, h, m: ((iw - w) // 2, m),
+    'top_right': lambda iw, ih, w, h, m: (iw - w - m, m),
+    'middle_left': lambda iw, ih, w, h, m: (m, (ih - h) // 2),
+    'center': lambda iw, ih, w, h, m: ((iw - w) // 2, (ih - h) // 2),
+    'middle_right': lambda iw, ih, w, h, m: (iw - w - m, (ih - h) // 2),
+    'bottom_left': lambda iw, ih, w, h, m: (m, ih - h - m),
+    'bottom_center': lambda iw, ih, w, h, m: ((iw - w) // 2, ih - h - m),
+    'bottom_right': lambda iw, ih, w, h, m: (iw - w - m, ih - h - m),
+}
+
+def _calc_pos_by_setting(settings, image_size, overlay_size):
+    # 优先使用自定义位置
+    custom_pos = settings['watermark_settings'].get('custom_position')
+    if custom_pos:
+        # 将预览坐标转换为原图坐标
+        return _preview_to_image_coords(custom_pos, image_size, overlay_size)
+        
+    # 使用预设位置（未知取值按右下角处理）
+    pos_key = settings['watermark_settings'].get('position', 'bottom_right')
+    calc = _POSITION_TABLE.get(pos_key, _POSITION_TABLE['bottom_right'])
+    return calc(image_size[0], image_size[1], overlay_size[0], overlay_size[1], 20)
+    
+def _preview_to_image_coords(preview_pos, image_size, overlay_size):
+    """将预览坐标转换为原图坐标（导出用）"""
+    try:
+        img_width, img_height = image_size
+        # 假设预览区域为 400x300（与主界面一致）
+        preview_width = 400
+        preview_height = 300
+        
+        # 计算缩放比例
+        scale_x = preview_width / img_width
+        scale_y = preview_height / img_height
+        scale = min(scale_x, scale_y)
+        
+        # 计算原图坐标
+        img_x = int(preview_pos[0] / scale)
+        img_y = int(preview_pos[1] / scale)
+        
+        # 确保不超出图片边界
+        wm_width, wm_height = overlay_size
+        img_x = max(0, min(img_x, img_width - wm_width))
+        img_y = max(0, min(img_y, img_height - wm_height))
+        
+        return (img_x, img_y)
+    except Exception:
+        return (20, 20)  # 默认位置
+    
+def _generate_output_filename(original_path, settings):
+    """生成输出文件名"""
+    base_name = os.path.splitext(os.path.basename(original_path))[0]
+    ext = os.path.splitext(original_path)[1].lower()
+    
+    # 根据输出格式调整扩展名
+    if settings['format'] == 'JPEG':
+        if ext in ['.png', '.bmp', '.tiff', '.tif']:
+            ext = '.jpg'
+    elif settings['format'] == 'PNG':
+        ext = '.png'
+        
+    # 根据命名规则处理
+    naming_rule = settings['naming_rule']
+    if naming_rule == "添加前缀":
+        prefix = settings['prefix']
+        return f"{prefix}{base_name}{ext}"
+    elif naming_rule == "添加后缀":
+        suffix = settings['suffix']
+        return f"{base_name}{suffix}{ext}"
+    else:  # 原文件名
+        return f"{base_name}{ext}"
+
+def _unique_output_filenames(image_paths, settings):
+    """为整批图片生成互不重复的输出文件名
+
+    不同文件夹中的同名图片会得到相同的输出文件名，并行导出时可能被多个进程同时写入同一文件；
+    重名者依次加上 _1、_2 等编号（按 normcase 比较，兼容 Windows 不区分大小写）。
+    """
+    names = [_generate_output_filename(image_path, settings) for image_path in image_paths]
+    used = {os.path.normcase(name) for name in names}
+    seen = set()
+    for i, name in enumerate(names):
+        key = os.path.normcase(name)
+        if key in seen:
+            stem, ext = os.path.splitext(name)
+            n = 1
+            while os.path.normcase(f"{stem}_{n}{ext}") in used:
+                n += 1
+            name = names[i] = f"{stem}_{n}{ext}"
+            key = os.path.normcase(name)
+            used.add(key)
+        seen.add(key)
+    return names
+
+def _write_file(path, data):
+    """绕过 Python 缓冲 IO，用 os.write 直接写出整个文件（通常只需一次系统调用）"""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(path, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            # 大文件可能被分多次写入
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _process_one(image_path, output_folder, settings, data=None, write=_write_file, output_filename=None):
+    """处理单张图片（在子进程中执行），返回 (是否成功, 错误信息)
+
+    data 为预先读入内存的文件内容；为 None 时直接从磁盘读取。
+    output_filename 为 None 时按命名规则生成输出文件名。
+    write(output_path, buffer) 负责写出编码结果，默认直接写入磁盘。
+    """
+    try:
+        # 生成输出文件名
+        if output_filename is None:
+            output_filename = _generate_output_filename(image_path, settings)
+        output_path = os.path.join(output_folder, output_filename)
+        
+        # 加载图片（用上下文确保句柄及时释放；水印可能直接绘制在 image 上，故在上下文内保存）
+        source = io.BytesIO(data) if data is not None else image_path
+        try:
+            opened = Image.open(source)
+        except Image.UnidentifiedImageError:
+            # 从内存读取时 Pillow 的错误信息只有 BytesIO 对象，改为显示文件路径
+            raise Image.UnidentifiedImageError(f"cannot identify image file {image_path!r}") from None
+        with opened as image:
+            orig_size = image.size
+            prepared = _export_prepared
+            max_dim = settings.get('max_dimension')
+            if max_dim and max(image.size) > max_dim:
+                # 限制最长边时先缩小再加水印；JPEG 借助 draft 按比例解码，调色板图先转为真彩色再平滑缩放
+                if image.mode in ('1', 'P'):
+                    image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+                image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+                # 水印同比缩小，相对图片的大小和位置与原尺寸导出（及预览）一致
+                prepared = _scaled_export_watermark(settings, image.width / orig_size[0])
+            else:
+                image.load()
+            # 添加水印（优先使用子进程中预先准备好的水印资源）
+            watermarked_image = _render_export_watermark(image, settings, prepared, orig_size)
+        
+            # 先编码到内存，再一次性写入磁盘
+            buf = io.BytesIO()
+            if settings['format'] == 'JPEG':
+                watermarked_image = _flatten_to_rgb(watermarked_image)
+                # 4:2:0 色度采样、单遍基线编码，避免额外的霍夫曼优化/渐进扫描
+                watermarked_image.save(buf, 'JPEG', quality=settings['quality'],
+                                       subsampling=2, optimize=False, progressive=False)
+            else:  # PNG
+                # zlib 1 级压缩比默认 6 级快数倍，照片类图片体积差别不大
+                watermarked_image.save(buf, 'PNG', compress_level=1)
+        write(output_path, buf.getbuffer())
+        return True, None
+    except Exception as e:
+        return False, f"{os.path.basename(image_path)}: {str(e)}"
+
+def _read_ahead(image_paths, pending):
+    """读取线程：提前读入后续图片的文件内容，使磁盘读取与解码、合成、编码重叠"""
+    for image_path in image_paths:
+        try:
+            with open(image_path, 'rb') as f:
+                pending.put((f.read(), None))
+        except Exception as e:
+            pending.put((None, e))
+
+def _write_behind(writes, errors):
+    """写入线程：把编码好的数据写入磁盘，与后续图片的解码、合成、编码重叠"""
+    while True:
+        item = writes.get()
+        if item is None:
+            return
+        index, image_path, output_path, data = item
+        try:
+            _write_file(output_path, data)
+        except Exception as e:
+            errors[index] = f"{os.path.basename(image_path)}: {str(e)}"
+
+def _process_batch(image_paths, output_folder, settings, output_filenames=None):
+    """在子进程中处理一组图片，返回与 image_paths 一一对应的 [(是否成功, 错误信息)]
+
+    output_filenames 为与 image_paths 对应的输出文件名（已去重）；为 None 时按命名规则生成。
+
+    读取、处理、写入三个阶段分别在读取线程、当前线程、写入线程中流水进行。
+    """
+    # 有界队列：最多预读 2 个文件、积压 2 个待写结果，限制内存占用
+    pending = queue.Queue(maxsize=2)
+    writes = queue.Queue(maxsize=2)
+    write_errors = {}
+    reader = threading.Thread(target=_read_ahead, args=(image_paths, pending), daemon=True)
+    writer = threading.Thread(target=_write_behind, args=(writes, write_errors), daemon=True)
+    reader.start()
+    writer.start()
+    results = []
+    for index, image_path in enumerate(image_paths):
+        data, error = pending.get()
+        if error is not None:
+            results.append((False, f"{os.path.basename(image_path)}: {str(error)}"))
+        else:
+            write = lambda output_path, buf, index=index, image_path=image_path: \
+                writes.put((index, image_path, output_path, buf))
+            output_filename = output_filenames[index] if output_filenames is not None else None
+            results.append(_process_one(image_path, output_folder, settings, data, write, output_filename))
+    writes.put(None)
+    reader.join()
+    writer.join()
+    # 写入失败的图片以写入线程记录的错误为准
+    for index, error in write_errors.items():
+        results[index] = (False, error)
+    return results
+
+_SUPPORTED_IMAGE_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'})
+
+def _scan_image_files(folder_path):
+    """递归列出文件夹中的图片文件（先当前目录文件，再进入子目录，与 os.walk 顺序一致）
+
+    使用 os.scandir，DirEntry 自带类型信息，无需逐个 stat；与 os.walk 一样不进入符号链接目录，无权限的目录直接跳过。
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in _SUPPORTED_IMAGE_EXTS and entry.is_file():
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        return files
+    for subdir in subdirs:
+        files.extend(_scan_image_files(subdir))
+    return files
+
+def _file_digest(path):
+    """文件内容的 16 字节 blake2b 摘要（内存映射读取，大文件不整体载入内存）"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.blake2b(digest_size=16).digest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.blake2b(m, digest_size=16).digest()
+
 class ExportThread(QThread):
-    """导出线程"""
+    """导出线程：负责调度进程池，保持界面响应"""
     progress_updated = pyqtSignal(int, int, str)  # current, total, filename
     finished = pyqtSignal(int, int, list)  # success_count, error_count, errors
     
@@ -113,206 +604,155 @@ class ExportThread(QThread):
         success_count = 0
         error_count = 0
         errors = []
+        total = len(self.image_list)
+        if not total:
+            self.finished.emit(0, 0, [])
+            return
         
-        for i, image_path in enumerate(self.image_list):
-            try:
-                # 发送进度更新
-                self.progress_updated.emit(i + 1, len(self.image_list), os.path.basename(image_path))
-                
-                # 加载图片（用上下文确保句柄及时释放）
-                with Image.open(image_path) as image:
-                    image.load()
-                    # 添加水印
-                    watermarked_image = self.add_watermark_to_image(image)
-                
-                # 生成输出文件名
-                output_filename = self.generate_output_filename(image_path)
-                output_path = os.path.join(self.output_folder, output_filename)
-                
-                # 保存图片
-                if self.settings['format'] == 'JPEG':
-                    if watermarked_image.mode == 'RGBA':
-                        rgb_image = Image.new('RGB', watermarked_image.size, (255, 255, 255))
-                        rgb_image.paste(watermarked_image, mask=watermarked_image.split()[-1])
-                        watermarked_image = rgb_image
-                    with open(output_path, 'wb') as f:
-                        watermarked_image.save(f, 'JPEG', quality=self.settings['quality'])
-                else:  # PNG
-                    with open(output_path, 'wb') as f:
-                        watermarked_image.save(f, 'PNG')
-                    
-                success_count += 1
-                
-            except Exception as e:
-                error_count += 1
-                errors.append(f"{os.path.basename(image_path)}: {str(e)}")
+        # 分发前统一解析字体文件，避免每个子进程重复搜索字体
+        settings = self.settings
+        if settings.get('watermark_type', '文本水印') != '图片水印' and not settings.get('resolved_font_path'):
+            wm = settings['watermark_settings']
+            fpath, _, _ = _select_font_file(
+                wm.get('font_family', 'Microsoft YaHei'), wm.get('is_bold', False),
+                wm.get('is_italic', False), _has_cjk(wm.get('text', ''))
+            )
+            if fpath:
+                settings = dict(settings, resolved_font_path=fpath)
+        
+        # 进程池相关模块只在导出时用到，延迟导入以缩短程序启动时间
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        import multiprocessing
+        
+        # 各图片相互独立，按 CPU 核数并行处理（Windows 下进程池上限为 61）
+        workers = max(1, min(total, os.cpu_count() or 1, 61))
+        # 分批交给子进程，批内由读取线程预读下一张
+        batch_size = max(1, total // (workers * 4))
+        batches = [self.image_list[i:i + batch_size] for i in range(0, total, batch_size)]
+        # 输出文件名在分发前统一去重，避免不同进程同时写入同一个文件
+        output_names = _unique_output_filenames(self.image_list, settings)
+        try:
+            # 本线程所在进程已有 Qt 与缩略图线程，fork 可能在子进程中死锁；
+            # 子进程只用到 Pillow 与模块级函数，统一用 spawn 启动（与 Windows 行为一致）
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker,
+                                     initargs=(settings,),
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {
+                    executor.submit(_process_batch, batch, self.output_folder, settings,
+                                    output_names[i:i + batch_size]): batch
+                    for i, batch in zip(range(0, total, batch_size), batches)
+                }
+                done = 0
+                # 按完成先后汇报进度，不会被某个较慢的批次阻塞
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    for image_path, (ok, err) in zip(batch, future.result()):
+                        done += 1
+                        # 发送进度更新
+                        self.progress_updated.emit(done, total, os.path.basename(image_path))
+                        if ok:
+                            success_count += 1
+                        else:
+                            error_count += 1
+                            errors.append(err)
+        except Exception as e:
+            # 进程池异常（如子进程被终止），剩余图片计为失败
+            remaining = total - success_count - error_count
+            error_count += remaining
+            errors.append(f"导出进程异常: {str(e)}")
                 
         # 发送完成信号
         self.finished.emit(success_count, error_count, errors)
-        
-    def add_watermark_to_image(self, image):
-        """为图片添加水印（复制主类的逻辑）"""
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-            
-        # 创建水印层
-        watermark = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(watermark)
-
-        wm_type = self.settings.get('watermark_type', '文本水印')
-        if wm_type == '图片水印':
-            # 与预览一致的图片水印
-            path = self.settings.get('image_watermark_path')
-            if path and os.path.exists(path):
-                try:
-                    with Image.open(path) as wm_img:
-                        if wm_img.mode != 'RGBA':
-                            wm_img = wm_img.convert('RGBA')
-                        op = max(0, min(100, int(self.settings.get('image_watermark_opacity', 70)))) / 100.0
-                        if op < 1.0:
-                            alpha = wm_img.split()[-1].point(lambda p: int(p * op))
-                            wm_img.putalpha(alpha)
-                        # 放置位置沿用文本位置计算（以水印图片尺寸为准）
-                        pos = self._calc_pos_by_setting(image.size, wm_img.size)
-                        watermark.paste(wm_img, pos, wm_img)
-                except Exception:
-                    pass
-        else:
-            # 文本水印参数
-            wm = self.settings['watermark_settings']
-            text = wm.get('text', '水印文字')
-            font_size = wm.get('font_size', 24)
-            opacity = wm.get('opacity', 70)
-            font_family = wm.get('font_family', 'Microsoft YaHei')
-            is_bold = wm.get('is_bold', False)
-            is_italic = wm.get('is_italic', False)
-            # 优先使用预览解析好的字体路径，确保导出与预览一致
-            resolved = self.settings.get('resolved_font_path')
-            if resolved and os.path.exists(resolved):
-                try:
-                    font = ImageFont.truetype(resolved, size=font_size)
-                    # 粗体判定：若路径对应粗体文件名，视为真实粗体
-                    name = os.path.basename(resolved).lower()
-                    has_real_bold = ('bd' in name) or ('bold' in name)
-                    has_real_italic = ('i.' in name) or ('italic' in name) or ('bi' in name)
-                except Exception:
-                    font, has_real_bold, has_real_italic = get_font_for_text(
-                        font_family, font_size, is_bold=is_bold, is_italic=is_italic, text=text
-                    )
-            else:
-                font, has_real_bold, has_real_italic = get_font_for_text(
-                    font_family, font_size, is_bold=is_bold, is_italic=is_italic, text=text
-                )
 
-            # 计算文本位置
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_sz = (bbox[2] - bbox[0], bbox[3] - bbox[1])
-            pos = self._calc_pos_by_setting(image.size, text_sz)
+def _pil_to_qimage(image, premultiplied=False):
+    """将 RGBA 图片转换为持有自身像素数据的 QImage（可长期缓存、跨线程传递）
 
-            # 颜色和透明度，与预览一致
-            base_color = wm.get('font_color', (255,255,255,180))
-            color = (base_color[0], base_color[1], base_color[2], int(255 * opacity / 100))
+    premultiplied 为 True 时转为 ARGB32 预乘格式：反复绘制的水印小图只转换一次，
+    之后每次 drawImage 都走 Qt 光栅引擎的预乘 SourceOver 快速路径。
+    """
+    q_image = QImage(image.tobytes('raw', 'RGBA'), image.width, image.height,
+                     4 * image.width, QImage.Format_RGBA8888)
+    if premultiplied:
+        # convertToFormat 返回的新图已持有自己的数据
+        return q_image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return q_image.copy()
 
-            # 阴影（与预览一致）
-            if wm.get('has_shadow', False):
-                shadow_color = (0, 0, 0, color[3] // 2)
-                draw.text((pos[0] + 2, pos[1] + 2), text, font=font, fill=shadow_color)
+class ThumbnailSignals(QObject):
+    """缩略图任务的信号载体（QRunnable 不是 QObject，无法直接发信号）"""
+    thumbnail_ready = pyqtSignal(str, QImage)  # file_path, thumbnail
 
-            # 伪粗体
-            if is_bold and not has_real_bold:
-                for dx, dy in [(0,0), (1,0), (0,1), (1,1)]:
-                    draw.text((pos[0]+dx, pos[1]+dy), text, font=font, fill=color)
-            else:
-                draw.text(pos, text, font=font, fill=color)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 已开始解码的文件路径（由工作线程加入），尚未开始的任务才可以取消
+        self.started = set()
 
-        # 合并
-        result = Image.alpha_composite(image, watermark)
-        return result
+class ThumbnailTask(QRunnable):
+    """在线程池中生成列表缩略图，避免批量导入时在界面线程解码原图"""
+    def __init__(self, file_path, signals, size=60):
+        super().__init__()
+        self.file_path = file_path
+        self.signals = signals
+        self.size = size
+        
+    def run(self):
+        self.signals.started.add(self.file_path)
+        try:
+            with Image.open(self.file_path) as image:
+                # 60x60 图标用双线性缩放已足够
+                image.thumbnail((self.size, self.size), Image.BILINEAR)
+                thumb = image.convert('RGBA')
+            q_image = _pil_to_qimage(thumb)
+        except Exception as e:
+            print(f"创建缩略图失败: {e}")
+            return
+        self.signals.thumbnail_ready.emit(self.file_path, q_image)
 
-    def _calc_pos_by_setting(self, image_size, overlay_size):
-        # 优先使用自定义位置
-        custom_pos = self.settings['watermark_settings'].get('custom_position')
-        if custom_pos:
-            # 将预览坐标转换为原图坐标
-            return self._preview_to_image_coords(custom_pos, image_size, overlay_size)
-            
-        # 使用预设位置
-        img_w, img_h = image_size
-        w, h = overlay_size
-        margin = 20
-        pos_key = self.settings['watermark_settings'].get('position', 'bottom_right')
-        if pos_key == 'top_left':
-            return (margin, margin)
-        if pos_key == 'top_center':
-            return ((img_w - w) // 2, margin)
-        if pos_key == 'top_right':
-            return (img_w - w - margin, margin)
-        if pos_key == 'middle_left':
-            return (margin, (img_h - h) // 2)
-        if pos_key == 'center':
-            return ((img_w - w) // 2, (img_h - h) // 2)
-        if pos_key == 'middle_right':
-            return (img_w - w - margin, (img_h - h) // 2)
-        if pos_key == 'bottom_left':
-            return (margin, img_h - h - margin)
-        if pos_key == 'bottom_center':
-            return ((img_w - w) // 2, img_h - h - margin)
-        return (img_w - w - margin, img_h - h - margin)
-        
-    def _preview_to_image_coords(self, preview_pos, image_size, overlay_size):
-        """将预览坐标转换为原图坐标（导出线程用）"""
+class DigestSignals(QObject):
+    """内容摘要任务的信号载体"""
+    digest_ready = pyqtSignal(str, object, bytes)  # file_path, file_size, digest（读取失败时为空）
+
+class DigestTask(QRunnable):
+    """在线程池中计算文件内容摘要，用于导入时的内容判重，避免在界面线程读取整个文件"""
+    def __init__(self, file_path, file_size, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.file_size = file_size
+        self.signals = signals
+
+    def run(self):
         try:
-            img_width, img_height = image_size
-            # 假设预览区域为 400x300（与主界面一致）
-            preview_width = 400
-            preview_height = 300
-            
-            # 计算缩放比例
-            scale_x = preview_width / img_width
-            scale_y = preview_height / img_height
-            scale = min(scale_x, scale_y)
-            
-            # 计算原图坐标
-            img_x = int(preview_pos[0] / scale)
-            img_y = int(preview_pos[1] / scale)
-            
-            # 确保不超出图片边界
-            wm_width, wm_height = overlay_size
-            img_x = max(0, min(img_x, img_width - wm_width))
-            img_y = max(0, min(img_y, img_height - wm_height))
-            
-            return (img_x, img_y)
-        except Exception:
-            return (20, 20)  # 默认位置
-        
-    def generate_output_filename(self, original_path):
-        """生成输出文件名"""
-        base_name = os.path.splitext(os.path.basename(original_path))[0]
-        ext = os.path.splitext(original_path)[1].lower()
-        
-        # 根据输出格式调整扩展名
-        if self.settings['format'] == 'JPEG':
-            if ext in ['.png', '.bmp', '.tiff', '.tif']:
-                ext = '.jpg'
-        elif self.settings['format'] == 'PNG':
-            ext = '.png'
-            
-        # 根据命名规则处理
-        naming_rule = self.settings['naming_rule']
-        if naming_rule == "添加前缀":
-            prefix = self.settings['prefix']
-            return f"{prefix}{base_name}{ext}"
-        elif naming_rule == "添加后缀":
-            suffix = self.settings['suffix']
-            return f"{base_name}{suffix}{ext}"
-        else:  # 原文件名
-            return f"{base_name}{ext}"
+            digest = _file_digest(self.file_path)
+        except OSError:
+            digest = b''
+        self.signals.digest_ready.emit(self.file_path, self.file_size, digest)
 
 class WatermarkApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.current_image = None
         self.image_list = []
+        self._image_set = set()
+        # 列表项 {file_path: item}，后台判重发现重复时据此移除
+        self._image_items = {}
+        # 内容判重：{文件大小: {'first': 尚未计算摘要的唯一文件, 'queued': 计算中的文件, 'digests': {摘要: 路径}}}
+        # 只有出现同样大小的文件时才在后台计算摘要；单线程按导入顺序计算，重复时保留先导入的文件
+        self._image_sizes = {}
+        self._digest_pool = QThreadPool(self)
+        self._digest_pool.setMaxThreadCount(1)
+        self._digest_signals = DigestSignals(self)
+        self._digest_signals.digest_ready.connect(self.on_digest_ready)
+        # 后台缩略图：已提交任务、等待图标的列表项 {file_path: item}
+        self._thumbnail_items = {}
+        # 尚未提交的列表项 {file_path: item}：滚动到可见区域附近时才解码，大批量导入不必一次解码全部图片
+        self._thumbnail_waiting = {}
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(30)
+        self._thumbnail_timer.timeout.connect(self._load_visible_thumbnails)
+        self._thumbnail_pool = QThreadPool(self)
+        self._thumbnail_pool.setMaxThreadCount(os.cpu_count() or 1)
+        self._thumbnail_signals = ThumbnailSignals(self)
+        self._thumbnail_signals.thumbnail_ready.connect(self.on_thumbnail_ready)
         self.watermark_settings = {
             'text': '水印文字',
             'font_family': 'Microsoft YaHei',
@@ -329,6 +769,27 @@ class WatermarkApp(QMainWindow):
             'custom_position': None  # (x, y) 自定义位置，优先级高于 position
         }
         self.templates = {}
+        # 预览底图缓存（LRU）：(图片路径, 修改时间, 目标宽, 目标高) -> (缩放并铺白底的 QPixmap, 原图尺寸)
+        self._preview_bg_cache = OrderedDict()
+        # 上次预览中水印在预览控件内的区域（QRect），用于点击检测
+        self._last_wm_rect = None
+        # 上次预览中水印位置对应的自定义坐标（与 custom_position 同一坐标系），拖拽从这里开始
+        self._last_wm_origin = None
+        # 文字小图缓存（LRU）：参数 -> (字体文件路径, get_text_sprite 的返回值)
+        self._text_sprite_cache = OrderedDict()
+        # 图片水印缓存：解码后的原图 ((路径, 修改时间), RGBA 图)，以及处理后小图的 LRU
+        self._wm_source = None
+        self._wm_tile_cache = OrderedDict()
+        # 预览防抖：设置变化后等待约一帧（20ms）无新变化再渲染
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(20)
+        self._preview_timer.timeout.connect(self._do_update_preview)
+        # 切换图片时先用最近邻快速出图，停留片刻后再换成平滑缩放的预览
+        self._preview_refine_timer = QTimer(self)
+        self._preview_refine_timer.setSingleShot(True)
+        self._preview_refine_timer.setInterval(80)
+        self._preview_refine_timer.timeout.connect(self._do_update_preview)
         self.init_ui()
         self.load_templates()
         
@@ -405,6 +866,10 @@ class WatermarkApp(QMainWindow):
         
         self.image_list_widget = QListWidget()
         self.image_list_widget.itemClicked.connect(self.on_image_selected)
+        # 滚动或可见区域变化后，为新露出的列表项生成缩略图
+        # （信号参数不能传给 QTimer.start，否则会被当作新的间隔）
+        self.image_list_widget.verticalScrollBar().valueChanged.connect(lambda *_: self._thumbnail_timer.start())
+        self.image_list_widget.verticalScrollBar().rangeChanged.connect(lambda *_: self._thumbnail_timer.start())
         list_layout.addWidget(self.image_list_widget)
         
         # 清空列表按钮
@@ -472,6 +937,17 @@ class WatermarkApp(QMainWindow):
         self.format_combo.currentTextChanged.connect(self.on_format_changed)
         self.quality_slider.valueChanged.connect(self.on_quality_changed)
         
+        # 输出尺寸上限（0 表示保持原尺寸），超过时按比例缩小后再加水印
+        size_layout = QHBoxLayout()
+        size_layout.addWidget(QLabel("最长边:"))
+        self.max_dimension_spin = QSpinBox()
+        self.max_dimension_spin.setRange(0, 20000)
+        self.max_dimension_spin.setSingleStep(256)
+        self.max_dimension_spin.setSpecialValueText("原尺寸")
+        self.max_dimension_spin.setSuffix(" px")
+        size_layout.addWidget(self.max_dimension_spin)
+        export_layout.addLayout(size_layout)
+        
         # 导出按钮
         export_btn = QPushButton("开始导出")
         export_btn.clicked.connect(self.export_images)
@@ -696,49 +1172,143 @@ class WatermarkApp(QMainWindow):
             "图片文件 (*.jpg *.jpeg *.png *.bmp *.tiff *.tif);;所有文件 (*)",
             options=options
         )
-        for file_path in file_paths:
-            self.add_image_to_list(file_path)
+        self.add_images_to_list(file_paths)
             
     def import_folder(self):
         """导入文件夹"""
         options = QFileDialog.ShowDirsOnly | QFileDialog.DontUseNativeDialog
         folder_path = QFileDialog.getExistingDirectory(self, "选择文件夹", "", options)
         if folder_path:
-            supported_formats = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif')
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(supported_formats):
-                        file_path = os.path.join(root, file)
-                        self.add_image_to_list(file_path)
+            self.add_images_to_list(_scan_image_files(folder_path))
                         
     def add_image_to_list(self, file_path):
         """添加图片到列表"""
-        if file_path not in self.image_list:
-            self.image_list.append(file_path)
+        self.add_images_to_list([file_path])
             
-            # 创建列表项
-            item = QListWidgetItem()
-            item.setText(os.path.basename(file_path))
-            item.setData(Qt.UserRole, file_path)
-            
-            # 创建缩略图
-            try:
-                pixmap = QPixmap(file_path)
-                if not pixmap.isNull():
-                    # 缩放缩略图
-                    scaled_pixmap = pixmap.scaled(60, 60, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    item.setIcon(QIcon(scaled_pixmap))
-            except Exception as e:
-                print(f"创建缩略图失败: {e}")
+    def add_images_to_list(self, file_paths):
+        """批量添加图片到列表，期间暂停列表重绘"""
+        self.image_list_widget.setUpdatesEnabled(False)
+        try:
+            for file_path in file_paths:
+                # 集合判重，避免大量导入时在列表上线性查找
+                if file_path in self._image_set:
+                    continue
+                self._image_set.add(file_path)
+                self.image_list.append(file_path)
+                self._check_duplicate_content(file_path)
+                
+                # 创建列表项
+                item = QListWidgetItem()
+                item.setText(os.path.basename(file_path))
+                item.setData(Qt.UserRole, file_path)
+                self._image_items[file_path] = item
                 
-            self.image_list_widget.addItem(item)
-            self.statusBar().showMessage(f"已添加 {len(self.image_list)} 张图片")
+                # 缩略图等列表项可见时再交给后台线程生成，完成后设置图标
+                self._thumbnail_waiting[file_path] = item
+                    
+                self.image_list_widget.addItem(item)
+        finally:
+            self.image_list_widget.setUpdatesEnabled(True)
+        self._thumbnail_timer.start()
+        self.statusBar().showMessage(f"已添加 {len(self.image_list)} 张图片")
+            
+    def _check_duplicate_content(self, file_path):
+        """按文件大小分组，同样大小的文件交给后台计算摘要，与已导入文件内容相同时再从列表移除"""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            # 读取失败时不做内容判重，照常加入列表
+            return
+        bucket = self._image_sizes.get(size)
+        if bucket is None:
+            # 大小独一无二时不可能重复，无需读取文件内容
+            self._image_sizes[size] = {'first': file_path, 'queued': set(), 'digests': {}}
+            return
+        if bucket['first'] is not None:
+            self._queue_digest(bucket, bucket['first'], size)
+            bucket['first'] = None
+        self._queue_digest(bucket, file_path, size)
+
+    def _queue_digest(self, bucket, file_path, size):
+        """提交后台摘要任务"""
+        bucket['queued'].add(file_path)
+        self._digest_pool.start(DigestTask(file_path, size, self._digest_signals))
+
+    def on_digest_ready(self, file_path, size, digest):
+        """后台摘要完成：同一分组中已有相同摘要（先导入）的文件时，移除当前文件"""
+        bucket = self._image_sizes.get(size)
+        if bucket is None or file_path not in bucket['queued']:
+            # 列表已被清空
+            return
+        bucket['queued'].discard(file_path)
+        if not digest:
+            return
+        if bucket['digests'].setdefault(digest, file_path) != file_path:
+            self.remove_image_from_list(file_path)
+            self.statusBar().showMessage(
+                f"已跳过内容重复的图片 {os.path.basename(file_path)}，共 {len(self.image_list)} 张图片")
+
+    def remove_image_from_list(self, file_path):
+        """从列表中移除一张图片"""
+        item = self._image_items.pop(file_path, None)
+        if item is None:
+            return
+        self._image_set.discard(file_path)
+        self.image_list.remove(file_path)
+        self._thumbnail_items.pop(file_path, None)
+        self._thumbnail_waiting.pop(file_path, None)
+        self.image_list_widget.takeItem(self.image_list_widget.row(item))
+        if self.current_image == file_path:
+            self.current_image = None
+            self._last_wm_rect = None
+            self.preview_label.setText("请选择图片进行预览")
+            
+    def _load_visible_thumbnails(self):
+        """为可见区域及其下一屏内尚未生成缩略图的列表项提交后台任务"""
+        # 快速滚动时，已离开视野且尚未开始的任务直接丢弃，放回等待队列
+        self._thumbnail_pool.clear()
+        started = self._thumbnail_signals.started
+        for file_path in [p for p in self._thumbnail_items if p not in started]:
+            self._thumbnail_waiting[file_path] = self._thumbnail_items.pop(file_path)
+        if not self._thumbnail_waiting:
+            return
+        widget = self.image_list_widget
+        limit = 2 * widget.viewport().height()
+        top_item = widget.itemAt(0, 0)
+        row = widget.row(top_item) if top_item is not None else 0
+        while row < widget.count():
+            item = widget.item(row)
+            if widget.visualItemRect(item).top() > limit:
+                break
+            file_path = item.data(Qt.UserRole)
+            if self._thumbnail_waiting.pop(file_path, None) is not None:
+                self._thumbnail_items[file_path] = item
+                started.discard(file_path)
+                self._thumbnail_pool.start(ThumbnailTask(file_path, self._thumbnail_signals))
+            row += 1
+            
+    def on_thumbnail_ready(self, file_path, q_image):
+        """后台缩略图生成完成"""
+        self._thumbnail_signals.started.discard(file_path)
+        item = self._thumbnail_items.pop(file_path, None)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(q_image)))
             
     def clear_image_list(self):
         """清空图片列表"""
+        # 丢弃尚未开始的缩略图任务，已完成的结果也不再对应任何列表项
+        self._thumbnail_pool.clear()
+        self._thumbnail_items.clear()
+        self._thumbnail_waiting.clear()
+        self._digest_pool.clear()
         self.image_list_widget.clear()
         self.image_list.clear()
+        self._image_set.clear()
+        self._image_items.clear()
+        self._image_sizes.clear()
         self.current_image = None
+        self._preview_bg_cache.clear()
+        self._last_wm_rect = None
         self.preview_label.setText("请选择图片进行预览")
         self.statusBar().showMessage("已清空图片列表")
         
@@ -746,233 +1316,257 @@ class WatermarkApp(QMainWindow):
         """选择图片时的处理"""
         file_path = item.data(Qt.UserRole)
         self.current_image = file_path
-        self.update_preview()
+        self._do_update_preview(fast=True)
         
     def update_preview(self):
-        """更新预览"""
+        """请求刷新预览：连续的输入只在停顿后渲染一次"""
+        self._preview_timer.start()
+        
+    def _do_update_preview(self, fast=False):
+        """更新预览；fast 为 True 时未缓存的底图先快速缩放，稍后再平滑刷新"""
+        self._preview_timer.stop()
+        self._preview_refine_timer.stop()
         if not self.current_image:
             return
             
         try:
-            # 加载原图
-            image = Image.open(self.current_image)
-            
-            # 添加水印
-            watermarked_image = self.add_watermark_to_image(image)
-            
-            # 转换为QPixmap显示
-            if watermarked_image.mode == 'RGBA':
-                # 处理透明通道
-                rgb_image = Image.new('RGB', watermarked_image.size, (255, 255, 255))
-                rgb_image.paste(watermarked_image, mask=watermarked_image.split()[-1])
-                watermarked_image = rgb_image
-            elif watermarked_image.mode != 'RGB':
-                watermarked_image = watermarked_image.convert('RGB')
-                
-            # 转换为QImage
-            width, height = watermarked_image.size
-            bytes_per_line = 3 * width
-            q_image = QImage(watermarked_image.tobytes(), width, height, bytes_per_line, QImage.Format_RGB888)
-            
-            # 缩放以适应预览区域大小
-            pixmap = QPixmap.fromImage(q_image)
             target_w = max(self.preview_label.width(), 400)
             target_h = max(self.preview_label.height(), 300)
-            scaled_pixmap = pixmap.scaled(target_w, target_h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             
-            self.preview_label.setPixmap(scaled_pixmap)
+            # 底图已缩放到预览尺寸并缓存，每次刷新只需在其副本上绘制水印小图
+            background, orig_size, exact = self.get_preview_background(target_w, target_h, fast)
+            if not exact:
+                self._preview_refine_timer.start()
+            scale = background.width() / orig_size[0]
+            pixmap = QPixmap(background)
+            
+            # 水印位置仍按原图坐标计算，再按比例换算到预览坐标；透明度交给 QPainter 处理
+            tile, position, opacity = self.get_preview_watermark(orig_size, scale)
+            self._last_wm_rect = None
+            if tile is not None:
+                painter = QPainter(pixmap)
+                painter.setOpacity(opacity)
+                painter.drawImage(position[0], position[1], tile)
+                painter.end()
+                # 记录水印在预览控件中的实际区域（图片居中显示），供点击检测使用
+                area = self.preview_label.contentsRect()
+                self._last_wm_rect = QRect(
+                    area.x() + (area.width() - pixmap.width()) // 2 + position[0],
+                    area.y() + (area.height() - pixmap.height()) // 2 + position[1],
+                    tile.width(), tile.height(),
+                )
+            
+            self.preview_label.setPixmap(pixmap)
             
         except Exception as e:
             QMessageBox.warning(self, "预览错误", f"无法预览图片: {str(e)}")
             
-    def add_watermark_to_image(self, image):
-        """为图片添加水印"""
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-            
-        # 创建水印层
-        watermark = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(watermark)
-        
+    def get_preview_background(self, target_w, target_h, fast=False):
+        """返回 (缩放到预览区域大小、已铺白底的底图 QPixmap, 原图尺寸, 是否为平滑缩放结果)
+
+        最近浏览过的图片按 (路径, 修改时间, 预览尺寸) 缓存，在列表中来回切换时无需重新解码；
+        拖动滑块等操作也不再读取原图。fast 为 True 且未命中缓存时改用最近邻缩放，结果不入缓存。
+        """
+        key = (self.current_image, os.stat(self.current_image).st_mtime_ns, target_w, target_h)
+        cached = self._preview_bg_cache.get(key)
+        if cached is not None:
+            self._preview_bg_cache.move_to_end(key)
+            return cached + (True,)
+        with Image.open(self.current_image) as image:
+            orig_size = image.size
+            # thumbnail 只缩小不放大，JPEG 还会借助 draft 按比例解码
+            image.thumbnail((target_w, target_h), Image.NEAREST if fast else Image.BILINEAR)
+            # 预览最终总是铺白底显示，先铺底再叠加水印结果相同
+            image = _flatten_to_rgb(image.convert('RGBA') if _has_alpha(image) else image.convert('RGB'))
+        data = image.tobytes()
+        q_image = QImage(data, image.width, image.height, 3 * image.width, QImage.Format_RGB888)
+        pixmap = QPixmap.fromImage(q_image)
+        # 小图放大或缩小后尺寸差一两个像素时，由 Qt 平滑缩放到恰好适应预览区域（只做一次）
+        fit = pixmap.size().scaled(target_w, target_h, Qt.KeepAspectRatio)
+        if fit != pixmap.size():
+            pixmap = pixmap.scaled(fit, Qt.IgnoreAspectRatio,
+                                   Qt.FastTransformation if fast else Qt.SmoothTransformation)
+        if fast:
+            return pixmap, orig_size, False
+        self._preview_bg_cache[key] = (pixmap, orig_size)
+        if len(self._preview_bg_cache) > 32:
+            self._preview_bg_cache.popitem(last=False)
+        return pixmap, orig_size, True
+        
+    def get_preview_watermark(self, image_size, scale=1.0):
+        """返回 (预览用水印 QImage, 预览坐标, 绘制不透明度)；无水印时 QImage 为 None
+
+        image_size 为原图尺寸，scale 为预览相对原图的缩放比例；
+        水印位置按原图坐标计算后再按比例绘制，保证预览与导出一致。
+        """
         watermark_type = self.watermark_type_combo.currentText()
         
         if watermark_type == "文本水印":
-            self.add_text_watermark(draw, image.size)
+            return self.get_text_watermark(image_size, scale)
         elif watermark_type == "图片水印":
-            self.add_image_watermark(watermark, image.size)
-            
-        # 合并水印和原图
-        result = Image.alpha_composite(image, watermark)
-        return result
+            return self.get_image_watermark(image_size, scale)
+        return None, (0, 0), 1.0
         
-    def add_text_watermark(self, draw, image_size):
-        """添加文本水印"""
+    def get_text_watermark(self, image_size, scale=1.0):
+        """返回文本水印 QImage、预览坐标及不透明度"""
         text = self.text_edit.text()
         if not text:
-            return
+            return None, (0, 0), 1.0
             
-        # 获取字体
         font_size = self.font_size_spin.value()
-        font_family = self.font_combo.currentText()
-        font, has_real_bold, has_real_italic = self.get_pil_font(
-            font_family,
-            font_size,
-            is_bold=self.bold_check.isChecked(),
-            is_italic=self.italic_check.isChecked(),
-            text=text,
+        # 在缩小的底图上绘制时，字号、坐标与阴影偏移同比缩放
+        draw_size = max(1, round(font_size * scale)) if scale != 1.0 else font_size
+        shadow_offset = max(1, round(2 * scale)) if self.shadow_check.isChecked() else 0
+        color = self.get_text_color()
+        text_size, sprite, (dx, dy) = self.get_text_sprite(
+            text, self.font_combo.currentText(), font_size, draw_size,
+            self.bold_check.isChecked(), self.italic_check.isChecked(), shadow_offset, color[:3],
         )
-            
-        # 计算文本位置
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
         
-        # 根据位置设置计算坐标
-        position = self.get_watermark_position(image_size, (text_width, text_height))
+        # 根据位置设置计算坐标（原图坐标）
+        position = self.get_watermark_position(image_size, text_size)
+        if scale != 1.0:
+            position = (round(position[0] * scale), round(position[1] * scale))
         
-        # 获取颜色和透明度
-        color = self.get_text_color()
+        # 缓存的文字图按完全不透明绘制，当前透明度在绘制时由 QPainter 施加
+        return sprite, (position[0] + dx, position[1] + dy), color[3] / 255
         
-        # 添加阴影
-        if self.shadow_check.isChecked():
-            shadow_color = (0, 0, 0, color[3] // 2)
-            draw.text((position[0] + 2, position[1] + 2), text, font=font, fill=shadow_color)
-            
-        # 绘制文本（如无真实粗体则用伪粗体叠描）
-        if self.bold_check.isChecked() and not has_real_bold:
-            for dx, dy in [(0,0), (1,0), (0,1), (1,1)]:
-                draw.text((position[0]+dx, position[1]+dy), text, font=font, fill=color)
-        else:
-            draw.text(position, text, font=font, fill=color)
+    def get_text_sprite(self, text, font_family, font_size, draw_size, is_bold, is_italic, shadow_offset, rgb):
+        """返回 (原字号下的文本尺寸, 完全不透明的文字 QImage, 小图相对绘制原点的偏移)
+
+        文字排版与光栅化结果按参数缓存，拖动水印或调整透明度时无需重新绘制文字。
+        """
+        key = (text, font_family, font_size, draw_size, is_bold, is_italic, shadow_offset, rgb)
+        cached = self._text_sprite_cache.get(key)
+        if cached is not None:
+            self._text_sprite_cache.move_to_end(key)
+            # 命中缓存时同样记录该字体文件，供导出线程复用
+            if cached[0]:
+                self.watermark_settings['resolved_font_path'] = cached[0]
+            return cached[1]
+        
+        # 文本尺寸按原字号测量，用于在原图坐标下计算位置
+        font, has_real_bold, has_real_italic = self.get_pil_font(
+            font_family, font_size, is_bold=is_bold, is_italic=is_italic, text=text
+        )
+        bbox = font.getbbox(text)
+        text_size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+        if draw_size != font_size:
+            font, has_real_bold, has_real_italic = self.get_pil_font(
+                font_family, draw_size, is_bold=is_bold, is_italic=is_italic, text=text
+            )
+            bbox = font.getbbox(text)
+        
+        # 绘制文本（如无真实粗体则用伪粗体），阴影为文字透明度的一半
+        shadow_color = (0, 0, 0, 127) if shadow_offset else None
+        fake_bold = is_bold and not has_real_bold
+        sprite, offset = _render_text_tile(
+            text, font, bbox, rgb + (255,), fake_bold, shadow_color, shadow_offset or 2
+        )
+        result = (text_size, _pil_to_qimage(sprite, premultiplied=True), offset)
+        self._text_sprite_cache[key] = (self.watermark_settings.get('resolved_font_path'), result)
+        if len(self._text_sprite_cache) > 32:
+            self._text_sprite_cache.popitem(last=False)
+        return result
         
     def get_pil_font(self, family: str, size: int, is_bold: bool = False, is_italic: bool = False, text: str = ""):
         """返回字体对象及是否为真实粗体/斜体。(font, has_real_bold, has_real_italic)
         优先匹配常见字体文件；若缺少对应字形，则回退到常规文件，并由调用方决定是否伪粗体。
         """
         try:
-            fonts_dir = os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')
-            # 映射: 常规, 粗体, 斜体, 粗斜体
-            mapping = {
-                'Microsoft YaHei': ('msyh.ttc', 'msyhbd.ttc', None, None),
-                'SimSun': ('simsun.ttc', None, None, None),
-                'SimHei': ('simhei.ttf', None, None, None),
-                'Arial': ('arial.ttf', 'arialbd.ttf', 'ariali.ttf', 'arialbi.ttf'),
-                'Times New Roman': ('times.ttf', 'timesbd.ttf', 'timesi.ttf', 'timesbi.ttf'),
-            }
-
-            def select_variant(fam: str):
-                reg, bold, italic, bolditalic = mapping.get(fam, (None, None, None, None))
-                if is_bold and is_italic and bolditalic:
-                    return bolditalic, True, True
-                if is_bold and bold:
-                    return bold, True, False
-                if is_italic and italic:
-                    return italic, False, True
-                return reg, False, False
-
-            # 若文本含中日韩字符，优先中文字体
-            def has_cjk(s: str) -> bool:
-                for ch in s:
-                    code = ord(ch)
-                    if (0x4E00 <= code <= 0x9FFF) or (0x3400 <= code <= 0x4DBF) or (0x20000 <= code <= 0x2A6DF):
-                        return True
-                return False
-
-            search_order = []
-            if has_cjk(text):
-                search_order.extend(['Microsoft YaHei', 'SimSun', 'SimHei'])
-            if family not in search_order:
-                search_order.insert(0, family)
-
-            tried = set()
-            for fam in search_order:
-                fname, real_bold, real_italic = select_variant(fam)
-                if not fname:
-                    continue
-                fpath = os.path.join(fonts_dir, fname)
-                if fpath in tried:
-                    continue
-                tried.add(fpath)
-                if os.path.exists(fpath):
-                    # 记录解析到的字体文件，供导出线程复用
-                    try:
-                        self.watermark_settings['resolved_font_path'] = fpath
-                    except Exception:
-                        pass
-                    return ImageFont.truetype(fpath, size=size), real_bold, real_italic
+            # 字体文件选择与字体加载均有模块级缓存，拖动滑块等频繁刷新时不再重复查找和解析
+            fpath, real_bold, real_italic = _select_font_file(family, is_bold, is_italic, _has_cjk(text))
+            if fpath:
+                # 记录解析到的字体文件，供导出线程复用
+                self.watermark_settings['resolved_font_path'] = fpath
+                return _load_truetype(fpath, size), real_bold, real_italic
 
             # 最后尝试家族名解析
             try:
-                return ImageFont.truetype(family, size=size), False, False
+                return _load_truetype(family, size), False, False
             except Exception:
                 return ImageFont.load_default(), False, False
         except Exception:
             return ImageFont.load_default(), False, False
 
-    def add_image_watermark(self, watermark_layer, image_size):
-        """添加图片水印"""
+    def get_image_watermark(self, image_size, scale=1.0):
+        """返回图片水印 QImage、预览坐标及不透明度"""
         image_path = self.image_path_edit.text()
         if not image_path or not os.path.exists(image_path):
-            return
+            return None, (0, 0), 1.0
             
         try:
-            # 加载水印图片
-            wm_image = Image.open(image_path)
-            if wm_image.mode != 'RGBA':
-                wm_image = wm_image.convert('RGBA')
-                
-            # 调整透明度
-            opacity = self.image_opacity_slider.value() / 100.0
-            if opacity < 1.0:
-                wm_image = ImageEnhance.Brightness(wm_image).enhance(opacity)
-                # 调整alpha通道
-                alpha = wm_image.split()[-1]
-                alpha = alpha.point(lambda p: int(p * opacity))
-                wm_image.putalpha(alpha)
-                
-            # 计算位置和大小
-            wm_size = wm_image.size
-            position = self.get_watermark_position(image_size, wm_size)
+            wm_size, tile = self.get_image_watermark_tile(
+                image_path, os.stat(image_path).st_mtime, self.image_opacity_slider.value(), scale
+            )
             
-            # 粘贴水印图片
-            watermark_layer.paste(wm_image, position, wm_image)
+            # 计算位置（原图坐标），在缩小的底图上绘制时同比缩放
+            position = self.get_watermark_position(image_size, wm_size)
+            if scale != 1.0:
+                position = (round(position[0] * scale), round(position[1] * scale))
+            return tile, position, 1.0
             
         except Exception as e:
             print(f"添加图片水印失败: {e}")
+            return None, (0, 0), 1.0
+            
+    def get_image_watermark_tile(self, image_path, mtime, opacity, scale):
+        """返回 (水印图片原始尺寸, 已处理透明度并按预览比例缩放的 QImage)
+
+        解码后的水印图片按 (路径, 修改时间) 缓存，处理结果按透明度与缩放比例做 LRU 缓存，
+        拖动水印或重复调整到相同数值时不再读取文件和逐像素处理。
+        """
+        key = (image_path, mtime, opacity, scale)
+        cached = self._wm_tile_cache.get(key)
+        if cached is not None:
+            self._wm_tile_cache.move_to_end(key)
+            return cached
+        
+        # 加载水印图片（文件被修改后修改时间变化，自动重新读取）
+        source = self._wm_source
+        if source is None or source[0] != (image_path, mtime):
+            with Image.open(image_path) as wm_image:
+                source = ((image_path, mtime), wm_image.convert('RGBA'))
+            self._wm_source = source
+        wm_image = source[1]
+        wm_size = wm_image.size
+        
+        # 调整透明度（只缩放 alpha 通道，与导出一致）
+        if opacity < 100:
+            wm_image = _scale_alpha(wm_image.copy(), opacity / 100.0)
+            
+        # 在缩小的底图上绘制时，水印图片同比缩放
+        if scale != 1.0:
+            scaled_size = (max(1, round(wm_size[0] * scale)), max(1, round(wm_size[1] * scale)))
+            wm_image = wm_image.resize(scaled_size, Image.BILINEAR)
+        
+        # 与导出一致：先以自身 alpha 为蒙版粘贴到同尺寸透明小图，再混合到底图；
+        # 这种叠加与不透明度不成线性关系，故透明度已在上面预先处理
+        tile = Image.new('RGBA', wm_image.size, (0, 0, 0, 0))
+        tile.paste(wm_image, (0, 0), wm_image)
+        result = (wm_size, _pil_to_qimage(tile, premultiplied=True))
+        self._wm_tile_cache[key] = result
+        if len(self._wm_tile_cache) > 8:
+            self._wm_tile_cache.popitem(last=False)
+        return result
             
     def get_watermark_position(self, image_size, watermark_size):
         """计算水印位置"""
         # 优先使用自定义位置
         custom_pos = self.watermark_settings.get('custom_position')
         if custom_pos:
+            self._last_wm_origin = custom_pos
             # 将预览坐标转换为原图坐标
             return self.preview_to_image_coords(custom_pos, image_size, watermark_size)
             
-        # 使用预设位置
-        img_width, img_height = image_size
-        wm_width, wm_height = watermark_size
-        margin = 20
-        
-        if self.watermark_settings['position'] == 'top_left':
-            return (margin, margin)
-        elif self.watermark_settings['position'] == 'top_center':
-            return ((img_width - wm_width) // 2, margin)
-        elif self.watermark_settings['position'] == 'top_right':
-            return (img_width - wm_width - margin, margin)
-        elif self.watermark_settings['position'] == 'middle_left':
-            return (margin, (img_height - wm_height) // 2)
-        elif self.watermark_settings['position'] == 'center':
-            return ((img_width - wm_width) // 2, (img_height - wm_height) // 2)
-        elif self.watermark_settings['position'] == 'middle_right':
-            return (img_width - wm_width - margin, (img_height - wm_height) // 2)
-        elif self.watermark_settings['position'] == 'bottom_left':
-            return (margin, img_height - wm_height - margin)
-        elif self.watermark_settings['position'] == 'bottom_center':
-            return ((img_width - wm_width) // 2, img_height - wm_height - margin)
-        elif self.watermark_settings['position'] == 'bottom_right':
-            return (img_width - wm_width - margin, img_height - wm_height - margin)
-        else:
-            return (margin, margin)
+        # 使用预设位置（查表，未知取值按左上角处理）
+        calc = _POSITION_TABLE.get(self.watermark_settings['position'], _POSITION_TABLE['top_left'])
+        position = calc(image_size[0], image_size[1], watermark_size[0], watermark_size[1], 20)
+        # 换算成自定义坐标记下，拖拽时从实际绘制的位置开始；
+        # 取像素中心，使 preview_to_image_coords 取整后恰好还原为该位置
+        scale = min(self.preview_label.width() / image_size[0], self.preview_label.height() / image_size[1])
+        self._last_wm_origin = ((position[0] + 0.5) * scale, (position[1] + 0.5) * scale)
+        return position
             
     def preview_to_image_coords(self, preview_pos, image_size, watermark_size):
         """将预览坐标转换为原图坐标"""
@@ -1033,7 +1627,7 @@ class WatermarkApp(QMainWindow):
                 # 开始拖拽
                 self.dragging = True
                 self.drag_start_pos = event.pos()
-                self.original_watermark_pos = self.watermark_settings.get('custom_position')
+                self.original_watermark_pos = self._last_wm_origin
                 self.preview_label.setCursor(Qt.ClosedHandCursor)
             else:
                 # 切换水印位置
@@ -1059,18 +1653,17 @@ class WatermarkApp(QMainWindow):
             return
             
         # 计算拖拽偏移
+        if self.original_watermark_pos is None:
+            return
         delta = event.pos() - self.drag_start_pos
-        if self.original_watermark_pos:
-            new_pos = (self.original_watermark_pos[0] + delta.x(), 
-                      self.original_watermark_pos[1] + delta.y())
-        else:
-            # 从当前位置计算
-            current_pos = self.get_current_watermark_position()
-            new_pos = (current_pos[0] + delta.x(), current_pos[1] + delta.y())
+        new_pos = (self.original_watermark_pos[0] + delta.x(), 
+                   self.original_watermark_pos[1] + delta.y())
             
         # 更新自定义位置
         self.watermark_settings['custom_position'] = new_pos
-        self.update_preview()
+        # 拖拽需要跟手：已有待执行的刷新时不再重启计时，每帧最多渲染一次
+        if not self._preview_timer.isActive():
+            self._preview_timer.start()
         
     def on_preview_release(self, event):
         """预览区域释放事件"""
@@ -1085,65 +1678,8 @@ class WatermarkApp(QMainWindow):
         if not self.current_image:
             return False
             
-        try:
-            # 获取当前水印位置和大小
-            current_pos = self.get_current_watermark_position()
-            if not current_pos:
-                return False
-                
-            # 计算水印区域（简化：假设水印区域为 100x30 像素）
-            watermark_rect = QRect(current_pos[0], current_pos[1], 100, 30)
-            return watermark_rect.contains(click_pos)
-        except Exception:
-            return False
-            
-    def get_current_watermark_position(self):
-        """获取当前水印在预览图中的位置"""
-        if not self.current_image:
-            return None
-            
-        try:
-            # 加载原图获取尺寸
-            image = Image.open(self.current_image)
-            img_width, img_height = image.size
-            
-            # 计算预览缩放比例
-            preview_width = self.preview_label.width()
-            preview_height = self.preview_label.height()
-            scale_x = preview_width / img_width
-            scale_y = preview_height / img_height
-            scale = min(scale_x, scale_y)
-            
-            # 计算水印在预览中的位置
-            if self.watermark_settings.get('custom_position'):
-                return self.watermark_settings['custom_position']
-            else:
-                # 使用预设位置计算
-                position = self.watermark_settings['position']
-                margin = 20
-                
-                if position == 'top_left':
-                    return (margin, margin)
-                elif position == 'top_center':
-                    return (preview_width // 2 - 50, margin)
-                elif position == 'top_right':
-                    return (preview_width - 100 - margin, margin)
-                elif position == 'middle_left':
-                    return (margin, preview_height // 2 - 15)
-                elif position == 'center':
-                    return (preview_width // 2 - 50, preview_height // 2 - 15)
-                elif position == 'middle_right':
-                    return (preview_width - 100 - margin, preview_height // 2 - 15)
-                elif position == 'bottom_left':
-                    return (margin, preview_height - 30 - margin)
-                elif position == 'bottom_center':
-                    return (preview_width // 2 - 50, preview_height - 30 - margin)
-                elif position == 'bottom_right':
-                    return (preview_width - 100 - margin, preview_height - 30 - margin)
-                else:
-                    return (margin, margin)
-        except Exception:
-            return None
+        # 使用上次预览实际绘制的水印区域，而非固定大小的估计
+        return self._last_wm_rect is not None and self._last_wm_rect.contains(click_pos)
             
     def on_opacity_changed(self, value):
         """透明度改变"""
@@ -1224,11 +1760,15 @@ class WatermarkApp(QMainWindow):
         # 同步最新的界面设置到 watermark_settings，避免导出读取旧值（如字号/字体）
         self.update_current_settings()
 
-        # 检查输出文件夹是否为原文件夹
-        for image_path in self.image_list:
-            if os.path.dirname(os.path.abspath(image_path)) == os.path.abspath(output_folder):
-                QMessageBox.warning(self, "警告", "不能导出到原文件夹，请选择其他文件夹")
-                return
+        # 检查输出文件夹是否为原文件夹：先收集所有原图所在目录（解析符号链接，同一目录只解析一次），
+        # 并包括链接所指原文件的目录，输出目录只解析一次
+        parent_dirs = {os.path.dirname(os.path.abspath(image_path)) for image_path in self.image_list}
+        source_dirs = {os.path.realpath(d) for d in parent_dirs}
+        source_dirs.update(os.path.dirname(os.path.realpath(image_path)) for image_path in self.image_list)
+        source_dirs = {os.path.normcase(d) for d in source_dirs}
+        if os.path.normcase(os.path.realpath(output_folder)) in source_dirs:
+            QMessageBox.warning(self, "警告", "不能导出到原文件夹，请选择其他文件夹")
+            return
         
         # 创建导出线程
         self.export_thread = ExportThread(self.image_list, output_folder, self.get_export_settings())
@@ -1237,7 +1777,6 @@ class WatermarkApp(QMainWindow):
         self.export_thread.start()
         
         # 显示进度对话框（非阻塞）
-        from PyQt5.QtWidgets import QProgressDialog
         self.progress_dialog = QProgressDialog("正在导出图片...", None, 0, len(self.image_list), self)
         self.progress_dialog.setWindowTitle("导出进度")
         self.progress_dialog.setWindowModality(Qt.WindowModal)
@@ -1252,6 +1791,7 @@ class WatermarkApp(QMainWindow):
         s = {
             'format': self.format_combo.currentText(),
             'quality': self.quality_slider.value(),
+            'max_dimension': self.max_dimension_spin.value(),
             'naming_rule': self.naming_combo.currentText(),
             'prefix': self.prefix_edit.text(),
             'suffix': self.suffix_edit.text(),
@@ -1304,7 +1844,8 @@ class WatermarkApp(QMainWindow):
         # 保存当前设置到模板
         self.templates[template_name] = self.watermark_settings.copy()
         self.save_templates()
-        self.update_template_combo()
+        # 刚保存的模板就是界面上的当前设置，选中它即可，无需重新加载
+        self.update_template_combo(template_name)
         self.template_name_edit.clear()
         QMessageBox.information(self, "成功", f"模板 '{template_name}' 已保存")
         
@@ -1354,35 +1895,58 @@ class WatermarkApp(QMainWindow):
                 self.save_templates()
                 self.update_template_combo()
                 
-    def update_template_combo(self):
-        """更新模板下拉框"""
-        self.template_combo.clear()
-        self.template_combo.addItems(list(self.templates.keys()))
-        
-    def update_ui_from_settings(self):
-        """从设置更新UI"""
-        # 这里应该根据watermark_settings更新各个UI控件
-        pass
+    def update_template_combo(self, current=None):
+        """更新模板下拉框，并选中 current（为 None 时不选中任何模板）
+
+        重建列表期间屏蔽信号，避免 currentTextChanged 把第一个模板加载到界面上、覆盖用户当前的设置。
+        """
+        self.template_combo.blockSignals(True)
+        try:
+            self.template_combo.clear()
+            self.template_combo.addItems(list(self.templates.keys()))
+            if current is None:
+                self.template_combo.setCurrentIndex(-1)
+            else:
+                self.template_combo.setCurrentText(current)
+        finally:
+            self.template_combo.blockSignals(False)
         
     def save_templates(self):
         """保存模板到文件"""
+        # 先写临时文件再替换，中途出错也不会留下写了一半的模板文件
+        tmp_path = 'templates.json.tmp'
         try:
-            with open('templates.json', 'w', encoding='utf-8') as f:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(self.templates, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, 'templates.json')
         except Exception as e:
             print(f"保存模板失败: {e}")
+            # 删除写了一半的临时文件
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
             
     def load_templates(self):
         """从文件加载模板"""
         try:
-            if os.path.exists('templates.json'):
-                with open('templates.json', 'r', encoding='utf-8') as f:
-                    self.templates = json.load(f)
-                self.update_template_combo()
+            # 直接打开，不再先 os.path.exists；文件不存在时什么也不做
+            with open('templates.json', 'rb') as f:
+                self.templates = json.loads(f.read())
+            # 启动时自动加载第一个模板（与之前信号触发的行为一致）
+            first = next(iter(self.templates), None)
+            self.update_template_combo(first)
+            self.load_template(first)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             print(f"加载模板失败: {e}")
 
 def main():
+    # 打包为可执行文件时，子进程需要经由 freeze_support 正确启动（仅此时才需导入）
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     _ensure_qt_plugin_env()
     app = QApplication(sys.argv)
     window = WatermarkApp()